@@ -1,9 +1,15 @@
-import io
 import os
 import streamlit as st
 from audiorecorder import audiorecorder
-from faster_whisper import WhisperModel
-from snowflake_agent import SnowflakeAgent
+from snowflake_agent import DEFAULT_MODEL, FAST_MODEL, SnowflakeAgent
+from transcription_ui import (
+    init_transcription_state,
+    show_transcription_error,
+    show_transcription_progress,
+    submit_transcription,
+    transcription_running,
+    transcription_settings,
+)
 
 # ---------------------------
 # Streamlit page setup
@@ -17,33 +23,52 @@ st.write(
     "based on the Snowflake FAQ knowledge base."
 )
 
+EXAMPLE_QUESTIONS = [
+    "What is a virtual warehouse?",
+    "Explain Time Travel in Snowflake",
+    "What's the difference between streams and tasks?",
+    "How does zero-copy cloning work?",
+    "What is Snowflake Cortex AI?",
+]
+
 # ---------------------------
 # Cached resources
 # ---------------------------
 @st.cache_resource
-def load_whisper_model():
-    # choose: tiny, base, small, medium, large
-    return WhisperModel("small", device="cpu")
-
-@st.cache_resource
-def get_snowflake_agent():
+def get_snowflake_agent(answer_model: str = DEFAULT_MODEL):
     api_key = os.environ.get("CEREBRAS_API_KEY")
     if not api_key:
         raise RuntimeError(
             "CEREBRAS_API_KEY environment variable is not set. "
             "Please set it before running the app."
         )
-    return SnowflakeAgent(api_key=api_key)
+    agent = SnowflakeAgent(api_key=api_key, model=answer_model)
+    agent.warmup()
+    # Answer the sidebar examples concurrently up front so clicking one is instant
+    agent.answer_many(EXAMPLE_QUESTIONS)
+    return agent
+
+def ask_example(question: str):
+    st.session_state.transcript = question
+    st.session_state.pending_question = question
 
-model = load_whisper_model()
+model_size, high_accuracy = transcription_settings()
+with st.sidebar:
+    answer_model = st.selectbox(
+        "Answer model",
+        [DEFAULT_MODEL, FAST_MODEL],
+        key="answer_model",
+        help="The 8B model answers faster; the 70B model reasons better over the FAQ.",
+    )
 
 # ---------------------------
 # Session state
 # ---------------------------
-if "transcript" not in st.session_state:
-    st.session_state.transcript = ""
 if "answer" not in st.session_state:
     st.session_state.answer = ""
+if "pending_question" not in st.session_state:
+    st.session_state.pending_question = ""  # asked but not yet answered
+init_transcription_state()
 
 # ---------------------------
 # Audio recorder
@@ -52,29 +77,19 @@ st.subheader("🎙️ Step 1: Record Your Question")
 audio = audiorecorder("🔴 Click to start / stop recording", "⏺️ Recording...")
 
 if len(audio) > 0:
-    st.audio(audio.export().read(), format="audio/wav")
+    # pydub writes WAV itself; the default mp3 export would spawn ffmpeg
+    st.audio(audio.export(format="wav").read(), format="audio/wav")
     st.success("Recording captured! Click the button below to transcribe.")
 
     if st.button("📝 Transcribe with Whisper"):
-        with st.spinner("Transcribing... this may take a few seconds"):
-            # Export audio to WAV bytes
-            wav_bytes_io = io.BytesIO()
-            audio.export(wav_bytes_io, format="wav")
-            wav_bytes_io.seek(0)
-
-            # Save to a temp file (Whisper needs a path)
-            with open("temp.wav", "wb") as f:
-                f.write(wav_bytes_io.read())
-
-            # Run Whisper locally
-            segments, info = model.transcribe("temp.wav")
-
-            # Collect transcript text
-            transcript_text = " ".join([seg.text for seg in segments])
-
-        st.session_state.transcript = transcript_text
+        submit_transcription(audio, model_size, high_accuracy)
         st.session_state.answer = ""  # Clear previous answer
 
+if transcription_running():
+    show_transcription_progress()
+else:
+    show_transcription_error()
+
 # ---------------------------
 # Show transcript and get answer
 # ---------------------------
@@ -92,35 +107,35 @@ if st.session_state.transcript:
     st.subheader("🤖 Step 3: Get Your Answer")
     
     if st.button("❄️ Ask Snowflake Agent"):
-        with st.spinner("Consulting the Snowflake knowledge base..."):
-            try:
-                agent = get_snowflake_agent()
-                answer = agent.answer(edited_transcript)
-                st.session_state.answer = answer
-            except Exception as e:
-                st.error(f"Error getting answer: {str(e)}")
+        st.session_state.pending_question = edited_transcript
 
 # ---------------------------
 # Display the answer
 # ---------------------------
-if st.session_state.answer:
+if st.session_state.pending_question:
+    st.subheader("💬 Answer")
+    # Stream the answer so the first words appear as soon as Cerebras sends them
+    try:
+        agent = get_snowflake_agent(answer_model)
+        st.session_state.answer = st.write_stream(
+            agent.answer_stream(st.session_state.pending_question)
+        )
+    except Exception as e:
+        st.error(f"Error getting answer: {str(e)}")
+    st.session_state.pending_question = ""
+elif st.session_state.answer:
     st.subheader("💬 Answer")
     st.markdown(st.session_state.answer)
-    
+
+if st.session_state.answer:
     # Option to ask follow-up
     st.divider()
     st.caption("Want to ask another question? Record a new audio above or type below:")
     
     followup = st.text_input("Type a follow-up question:", key="followup_input")
     if followup and st.button("Ask Follow-up"):
-        with st.spinner("Getting answer..."):
-            try:
-                agent = get_snowflake_agent()
-                answer = agent.answer(followup)
-                st.session_state.answer = answer
-                st.rerun()
-            except Exception as e:
-                st.error(f"Error getting answer: {str(e)}")
+        st.session_state.pending_question = followup
+        st.rerun()
 
 # ---------------------------
 # Sidebar with info
@@ -136,10 +151,15 @@ with st.sidebar:
     
     st.divider()
     st.header("💡 Example Questions")
-    st.write(
-        "- What is a virtual warehouse?\n"
-        "- Explain Time Travel in Snowflake\n"
-        "- What's the difference between streams and tasks?\n"
-        "- How does zero-copy cloning work?\n"
-        "- What is Snowflake Cortex AI?"
-    )
+    for question in EXAMPLE_QUESTIONS:
+        st.button(question, on_click=ask_example, args=(question,), use_container_width=True)
+
+# ---------------------------
+# Eager agent setup
+# ---------------------------
+# Runs after the page has rendered: builds the cached agent, opens the
+# Cerebras connection and prefetches the examples before the first click.
+try:
+    get_snowflake_agent(answer_model)
+except RuntimeError as e:
+    st.error(str(e))
@@ -0,0 +1,68 @@
+"""
+Whisper Transcription Server
+
+This module serves the local Whisper model over HTTP. The model is loaded
+once per worker process instead of inside Streamlit, so app reloads do not
+reload it and several Streamlit frontends can share it.
+
+Run with:
+    uvicorn server:app --workers 2 --loop uvloop
+"""
+
+import asyncio
+import io
+
+# Imported first: transcriber pins the OpenMP thread pool, which must happen
+# before faster_whisper loads CTranslate2.
+from transcriber import (
+    MAX_BATCH_CLIP_SAMPLES,
+    SAMPLE_RATE,
+    TranscriptionBatcher,
+    create_whisper_model,
+    pcm_to_array,
+    transcribe,
+)
+from fastapi import FastAPI, HTTPException, Request
+from faster_whisper import decode_audio
+
+app = FastAPI(title="Whisper Transcription Server")
+
+model = create_whisper_model()
+batcher = TranscriptionBatcher(model)
+
+
+def transcribe_long(audio, high_accuracy: bool) -> str:
+    """Transcribe a clip the batcher doesn't take or flags: long, high accuracy, or unreliable."""
+    segments, info = transcribe(model, audio, high_accuracy=high_accuracy)
+    return " ".join(seg.text for seg in segments)
+
+
+@app.post("/transcribe")
+async def transcribe_audio(request: Request, high_accuracy: bool = False) -> dict:
+    """
+    Transcribe the audio in the request body.
+
+    The body is either raw 16 kHz mono 16-bit PCM sent as
+    application/octet-stream, or any audio file format PyAV can decode.
+    """
+    body = await request.body()
+    media_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if media_type == "application/octet-stream":
+        if len(body) % 2:
+            raise HTTPException(status_code=400, detail="PCM body must be 16-bit samples.")
+        audio = pcm_to_array(body)
+    else:
+        try:
+            audio = decode_audio(io.BytesIO(body), sampling_rate=SAMPLE_RATE)
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=f"Could not decode audio: {e}") from e
+
+    if not high_accuracy and len(audio) <= MAX_BATCH_CLIP_SAMPLES:
+        # Short clips from concurrent requests share one decoder batch
+        text = await asyncio.wrap_future(batcher.submit(audio))
+        if text is None:
+            # The greedy decode looked unreliable; retry off the batcher thread
+            text = await asyncio.to_thread(transcribe_long, audio, True)
+    else:
+        text = await asyncio.to_thread(transcribe_long, audio, high_accuracy)
+    return {"text": text}
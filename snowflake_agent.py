@@ -5,31 +5,133 @@ This module provides an LLM-powered agent that answers questions about
 Snowflake concepts using the FAQ knowledge base and Cerebras inference.
 """
 
+import asyncio
+import hashlib
+import logging
 import os
+import re
+import threading
+from collections.abc import Iterator
 from pathlib import Path
-from cerebras.cloud.sdk import Cerebras
+from cerebras.cloud.sdk import AsyncCerebras, Cerebras
+
+try:
+    from sentence_transformers import SentenceTransformer
+except ImportError:  # retrieval is optional; without it the whole FAQ is sent
+    SentenceTransformer = None
+
+logger = logging.getLogger(__name__)
 
 # Load FAQ content at module level
 FAQ_PATH = Path(__file__).parent / "FAQ.md"
 
+EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+TOP_K = 3
+MAX_CHUNK_CHARS = 1500
+
+# The 70B model reasons best over the FAQ; the 8B model is much faster and
+# good enough for simple definitions.
+DEFAULT_MODEL = "llama-3.3-70b"
+FAST_MODEL = "llama3.1-8b"
+
+# Most answers kept per agent; the oldest is evicted first.
+ANSWER_CACHE_SIZE = 256
+
+NO_RESPONSE_MESSAGE = "I apologize, but I couldn't generate a response. Please try again."
+
 def load_faq_content() -> str:
     """Load the FAQ markdown content."""
-    if FAQ_PATH.exists():
+    try:
         return FAQ_PATH.read_text(encoding="utf-8")
-    return ""
+    except FileNotFoundError:
+        return ""
 
-FAQ_CONTENT = load_faq_content()
+def split_faq_chunks(faq_content: str) -> list[str]:
+    """
+    Split the FAQ markdown into chunks along its H2/H3 headings.
 
-SYSTEM_PROMPT = f"""You are a helpful Snowflake expert assistant. Your role is to answer questions about Snowflake data platform concepts, features, and terminology.
+    Each chunk starts with its heading path so related entries keep their
+    context. Sections longer than MAX_CHUNK_CHARS are split between Q/A
+    entries.
+    """
+    chunks = []
+    h2 = h3 = ""
+    for section in re.split(r"^(?=#{2,3} )", faq_content, flags=re.MULTILINE):
+        heading, _, body = section.partition("\n")
+        if heading.startswith("### "):
+            h3 = heading[4:].strip()
+        elif heading.startswith("## "):
+            h2, h3 = heading[3:].strip(), ""
+        else:
+            continue  # title and introduction before the first section
+        title = " > ".join(filter(None, [h2, h3]))
+        body = re.sub(r"^---\s*$", "", body, flags=re.MULTILINE)
 
-You have access to the following Snowflake FAQ knowledge base:
+        group = []
+        for entry in re.split(r"^(?=Q: )", body, flags=re.MULTILINE):
+            entry = entry.strip()
+            if not entry:
+                continue
+            if group and len("\n\n".join(group)) + len(entry) > MAX_CHUNK_CHARS:
+                chunks.append(f"## {title}\n\n" + "\n\n".join(group))
+                group = []
+            group.append(entry)
+        if group:
+            chunks.append(f"## {title}\n\n" + "\n\n".join(group))
+    return chunks
 
----
-{FAQ_CONTENT}
----
 
-Instructions:
-1. Answer questions based on the FAQ content above.
+class FAQRetriever:
+    """
+    Finds the FAQ chunks most relevant to a question using sentence embeddings.
+    """
+
+    def __init__(self, chunks: list[str], model_name: str = EMBEDDING_MODEL):
+        """
+        Embed the FAQ chunks once so each query only needs a single encode.
+
+        Embeddings are L2-normalized up front, so cosine similarity against
+        every chunk is one matrix-vector product.
+
+        Args:
+            chunks: The FAQ chunks to search.
+            model_name: The sentence-transformers model used for embeddings.
+        """
+        self.chunks = chunks
+        self.encoder = SentenceTransformer(model_name)
+        self.embeddings = self.encoder.encode(chunks, normalize_embeddings=True)
+
+    def search(self, question: str, top_k: int = TOP_K) -> list[str]:
+        """
+        Return the top_k chunks by cosine similarity to the question.
+
+        Args:
+            question: The user's question.
+            top_k: Number of chunks to return.
+
+        Returns:
+            The matching FAQ chunks, best match first.
+        """
+        query = self.encoder.encode(question, normalize_embeddings=True)
+        scores = self.embeddings @ query
+        return [self.chunks[i] for i in scores.argsort()[::-1][:top_k]]
+
+
+FAQ_CONTENT = load_faq_content()
+def load_faq_retriever() -> FAQRetriever | None:
+    """Build the FAQ retriever, or return None so the full FAQ is sent instead."""
+    if SentenceTransformer is None or not FAQ_CONTENT:
+        return None
+    try:
+        return FAQRetriever(split_faq_chunks(FAQ_CONTENT))
+    except Exception as e:  # e.g. offline, or the embedding model failed to download
+        logger.warning("FAQ retrieval disabled, sending the full FAQ instead: %s", e)
+        return None
+
+FAQ_RETRIEVER = load_faq_retriever()
+
+INSTRUCTIONS = """Instructions:
+1. Answer questions based on the FAQ content provided.
 2. If the question relates to a topic in the FAQ, provide a clear and concise answer.
 3. If the question is about Snowflake but not covered in the FAQ, provide your best knowledge but mention that it may not be in the official glossary.
 4. If the question is not related to Snowflake at all, politely redirect the user to ask Snowflake-related questions.
@@ -37,6 +139,43 @@ Instructions:
 6. When relevant, mention related concepts the user might want to learn about.
 """
 
+# The system prompt is built once at import and never changes between calls,
+# so the provider can serve it from its prompt prefix cache. With a
+# retriever, only the relevant FAQ chunks travel in the user message instead
+# of the whole knowledge base.
+if FAQ_RETRIEVER is not None:
+    SYSTEM_PROMPT = f"""You are a helpful Snowflake expert assistant. Your role is to answer questions about Snowflake data platform concepts, features, and terminology.
+
+Each question comes with the most relevant excerpts from the Snowflake FAQ knowledge base.
+
+{INSTRUCTIONS}"""
+else:
+    SYSTEM_PROMPT = f"""You are a helpful Snowflake expert assistant. Your role is to answer questions about Snowflake data platform concepts, features, and terminology.
+
+You have access to the following Snowflake FAQ knowledge base:
+
+---
+{FAQ_CONTENT}
+---
+
+{INSTRUCTIONS}"""
+
+
+def build_user_message(question: str) -> str:
+    """
+    Build the user message, prefixed with relevant FAQ excerpts when retrieval is available.
+
+    Args:
+        question: The user's question about Snowflake.
+
+    Returns:
+        The content of the user message.
+    """
+    if FAQ_RETRIEVER is None:
+        return question
+    excerpts = "\n\n".join(FAQ_RETRIEVER.search(question))
+    return f"FAQ excerpts:\n---\n{excerpts}\n---\n\nQuestion: {question}"
+
 
 class SnowflakeAgent:
     """
@@ -44,12 +183,13 @@ class SnowflakeAgent:
     using Cerebras inference and the FAQ knowledge base.
     """
 
-    def __init__(self, api_key: str | None = None):
+    def __init__(self, api_key: str | None = None, model: str = DEFAULT_MODEL):
         """
         Initialize the Snowflake agent.
         
         Args:
             api_key: Cerebras API key. If not provided, reads from CEREBRAS_API_KEY env var.
+            model: Cerebras model used to answer questions.
         """
         self.api_key = api_key or os.environ.get("CEREBRAS_API_KEY")
         if not self.api_key:
@@ -58,7 +198,51 @@ class SnowflakeAgent:
                 "set the CEREBRAS_API_KEY environment variable."
             )
         self.client = Cerebras(api_key=self.api_key)
-        self.model = "llama-3.3-70b"
+        self.model = model
+        # Successful answers keyed by normalized question, shared by answer and answer_many
+        self._answers: dict[str, str] = {}
+        self._answers_lock = threading.Lock()
+
+    def warmup(self) -> None:
+        """Open the connection to Cerebras with a 1-token request before the first question."""
+        try:
+            self.client.chat.completions.create(
+                model=self.model,
+                messages=[{"role": "user", "content": "ping"}],
+                max_completion_tokens=1,
+            )
+        except Exception:
+            pass  # best effort; real errors surface on the first answer
+
+    @staticmethod
+    def _cache_key(question: str) -> str:
+        """Key questions that differ only in case or surrounding whitespace together."""
+        return hashlib.sha1(question.lower().strip().encode("utf-8")).hexdigest()
+
+    def _cached_answer(self, question: str) -> str | None:
+        """Return a previous answer to the question, if any."""
+        return self._answers.get(self._cache_key(question))
+
+    def _remember(self, question: str, answer: str) -> None:
+        """Cache an answer, evicting the oldest one when the cache is full."""
+        with self._answers_lock:
+            if len(self._answers) >= ANSWER_CACHE_SIZE:
+                del self._answers[next(iter(self._answers))]
+            self._answers[self._cache_key(question)] = answer
+
+    def _messages(self, question: str) -> list[dict]:
+        """Build the chat messages for a question."""
+        return [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": build_user_message(question)},
+        ]
+
+    def _parse_response(self, response) -> str | None:
+        """Extract the answer text from a completion, or None if it is empty."""
+        try:
+            return response.choices[0].message.content.strip() or None
+        except (IndexError, AttributeError):
+            return None
 
     def answer(self, question: str) -> str:
         """
@@ -70,39 +254,131 @@ class SnowflakeAgent:
         Returns:
             The agent's answer as a string.
         """
+        cached = self._cached_answer(question)
+        if cached is not None:
+            return cached
+
         try:
             response = self.client.chat.completions.create(
                 model=self.model,
-                messages=[
-                    {"role": "system", "content": SYSTEM_PROMPT},
-                    {"role": "user", "content": question},
-                ],
+                messages=self._messages(question),
             )
 
-            if (
-                not hasattr(response, "choices")
-                or len(response.choices) == 0
-                or not response.choices[0].message
-            ):
-                return "I apologize, but I couldn't generate a response. Please try again."
+            answer = self._parse_response(response)
+            if answer is None:
+                return NO_RESPONSE_MESSAGE
 
-            return response.choices[0].message.content.strip()
+            self._remember(question, answer)
+            return answer
 
         except Exception as e:
             return f"Error communicating with the AI service: {str(e)}"
 
+    def answer_stream(self, question: str) -> Iterator[str]:
+        """
+        Answer a question, yielding text as soon as Cerebras generates it.
+        
+        Args:
+            question: The user's question about Snowflake.
+            
+        Yields:
+            Pieces of the answer, in order.
+        """
+        cached = self._cached_answer(question)
+        if cached is not None:
+            yield cached
+            return
+
+        parts = []
+        try:
+            stream = self.client.chat.completions.create(
+                model=self.model,
+                messages=self._messages(question),
+                stream=True,
+            )
+            for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content or ""
+                parts.append(delta)
+                yield delta
+
+        except Exception as e:
+            yield f"Error communicating with the AI service: {str(e)}"
+            return
+
+        answer = "".join(parts).strip()
+        if not answer:
+            yield NO_RESPONSE_MESSAGE
+            return
+        self._remember(question, answer)
+
+    async def _answer_async(self, client: AsyncCerebras, question: str) -> str:
+        """Answer one question with the async client, caching successful answers."""
+        cached = self._cached_answer(question)
+        if cached is not None:
+            return cached
+
+        try:
+            response = await client.chat.completions.create(
+                model=self.model,
+                messages=self._messages(question),
+            )
+
+            answer = self._parse_response(response)
+            if answer is None:
+                return NO_RESPONSE_MESSAGE
+
+            self._remember(question, answer)
+            return answer
+
+        except Exception as e:
+            return f"Error communicating with the AI service: {str(e)}"
+
+    async def answer_many_async(self, questions: list[str]) -> list[str]:
+        """
+        Answer several questions concurrently.
+        
+        Args:
+            questions: The user's questions about Snowflake.
+            
+        Returns:
+            The answers, in the same order as the questions.
+        """
+        # The async client's connection pool is bound to the running event
+        # loop, so it is created per call rather than stored on the agent.
+        async with AsyncCerebras(api_key=self.api_key) as client:
+            return await asyncio.gather(
+                *(self._answer_async(client, question) for question in questions)
+            )
+
+    def answer_many(self, questions: list[str]) -> list[str]:
+        """
+        Answer several questions concurrently from synchronous code.
+        
+        Args:
+            questions: The user's questions about Snowflake.
+            
+        Returns:
+            The answers, in the same order as the questions.
+        """
+        return asyncio.run(self.answer_many_async(questions))
+
 
-def get_snowflake_answer(question: str, api_key: str | None = None) -> str:
+def get_snowflake_answer(
+    question: str, api_key: str | None = None, model: str = DEFAULT_MODEL
+) -> str:
     """
     Convenience function to get an answer about Snowflake.
     
     Args:
         question: The user's question about Snowflake.
         api_key: Optional Cerebras API key.
+        model: Cerebras model used to answer the question.
         
     Returns:
         The agent's answer as a string.
     """
-    agent = SnowflakeAgent(api_key=api_key)
+    agent = SnowflakeAgent(api_key=api_key, model=model)
     return agent.answer(question)
 
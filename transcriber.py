@@ -0,0 +1,401 @@
+"""
+Local Whisper Transcription Module
+
+This module loads the faster-whisper model used by the Streamlit apps,
+picking the fastest CTranslate2 backend available on the host.
+"""
+
+import json
+import os
+import queue
+import threading
+import time
+import urllib.request
+import zlib
+from concurrent.futures import Future
+from pathlib import Path
+
+try:
+    import psutil
+except ImportError:  # psutil is optional; assume two hardware threads per core
+    psutil = None
+
+
+def physical_core_count() -> int:
+    """Return the number of physical CPU cores."""
+    if psutil is not None and psutil.cpu_count(logical=False):
+        return psutil.cpu_count(logical=False)
+    return max(1, (os.cpu_count() or 2) // 2)
+
+
+# OpenMP reads this once when CTranslate2 is loaded, so it must be set
+# before the faster_whisper import below. Using physical cores only keeps
+# Whisper from oversubscribing hyperthreads.
+os.environ.setdefault("OMP_NUM_THREADS", str(physical_core_count()))
+
+import ctranslate2
+import numpy as np
+from faster_whisper import WhisperModel
+from faster_whisper.audio import pad_or_trim
+from faster_whisper.tokenizer import Tokenizer
+from faster_whisper.vad import VadOptions, get_speech_timestamps
+from pydub import AudioSegment
+
+# choose: distil-small.en, tiny, base, small, medium, large
+WHISPER_MODEL_SIZE = os.environ.get("WHISPER_MODEL_SIZE", "distil-small.en")
+
+# Directory of models converted ahead of time with ct2-transformers-converter,
+# one subdirectory per model name (e.g. /models/distil-small.en). Models found
+# there load from disk instead of being downloaded from Hugging Face.
+WHISPER_MODEL_DIR = os.environ.get("WHISPER_MODEL_DIR", "")
+
+# Fastest first. distil-small.en keeps 4 of small's 12 decoder layers, so
+# the autoregressive decoder does about a third of the work, at a small cost
+# in English WER. The encoder, and so its cost, is the same as small's.
+MODEL_CHOICES = list(dict.fromkeys(["distil-small.en", "small", "medium", WHISPER_MODEL_SIZE]))
+
+# When set, the apps send audio to server.py at this URL instead of loading
+# a model in the Streamlit process.
+WHISPER_SERVER_URL = os.environ.get("WHISPER_SERVER_URL", "")
+
+# Seconds to wait for the server before giving up on a transcription, so a
+# stalled server surfaces as an error instead of a job that never finishes.
+WHISPER_SERVER_TIMEOUT = float(os.environ.get("WHISPER_SERVER_TIMEOUT", "120"))
+
+# Whisper models expect 16 kHz mono input.
+SAMPLE_RATE = 16000
+
+# Clips up to one 30-second Whisper window can be batched across sessions.
+MAX_BATCH_CLIP_SAMPLES = 30 * SAMPLE_RATE
+
+
+def get_device() -> str:
+    """Return "cuda" when a CUDA device is visible to CTranslate2, else "cpu"."""
+    return "cuda" if ctranslate2.get_cuda_device_count() > 0 else "cpu"
+
+
+def resolve_model(model_size: str) -> str:
+    """Return the pre-converted model directory for model_size if there is one, else model_size."""
+    if WHISPER_MODEL_DIR:
+        path = Path(WHISPER_MODEL_DIR) / model_size
+        if path.is_dir():
+            return str(path)
+    return model_size
+
+
+def create_whisper_model(model_size: str | None = None) -> WhisperModel:
+    """
+    Build a Whisper model on the fastest available backend.
+
+    GPUs run in float16; CPUs run int8, which uses the VNNI/AVX2 integer
+    paths of CTranslate2. Both can be overridden with the
+    WHISPER_COMPUTE_TYPE environment variable.
+
+    Args:
+        model_size: Model name or path. Defaults to WHISPER_MODEL_SIZE.
+
+    Returns:
+        A warmed-up WhisperModel.
+    """
+    device = get_device()
+    compute_type = os.environ.get(
+        "WHISPER_COMPUTE_TYPE", "float16" if device == "cuda" else "int8"
+    )
+    model = WhisperModel(
+        resolve_model(model_size or WHISPER_MODEL_SIZE),
+        device=device,
+        compute_type=compute_type,
+        cpu_threads=int(os.environ["OMP_NUM_THREADS"]),
+        num_workers=1,
+    )
+    warmup(model)
+    return model
+
+
+def warmup(model: WhisperModel) -> None:
+    """
+    Run one second of silence through the model.
+
+    This pages in the weights and starts the thread pool at load time, so the
+    first user recording does not pay those one-off costs.
+    """
+    # Bypasses transcribe(): its VAD filter would drop the silence entirely.
+    segments, _ = model.transcribe(np.zeros(SAMPLE_RATE, dtype=np.float32), language="en")
+    list(segments)
+
+
+# Greedy decoding is several times faster than beam search and is accurate
+# enough for short spoken questions; beam search is kept for long dictation.
+FAST_DECODE_OPTIONS = {
+    "beam_size": 1,
+    "best_of": 1,
+    "temperature": 0.0,
+    "condition_on_previous_text": False,
+}
+ACCURATE_DECODE_OPTIONS = {
+    "beam_size": 5,
+    "best_of": 5,
+    "condition_on_previous_text": True,
+}
+
+# Silero VAD drops leading/trailing silence and long pauses before decoding,
+# so the encoder and decoder only run over speech.
+VAD_PARAMETERS = {"min_silence_duration_ms": 300, "speech_pad_ms": 100}
+
+
+def audio_to_pcm(audio: AudioSegment) -> bytes:
+    """
+    Convert a recording to 16 kHz mono 16-bit PCM.
+
+    The recording is already decoded PCM, so it is resampled in memory; no
+    WAV file is written and ffmpeg is never spawned.
+    """
+    return audio.set_channels(1).set_frame_rate(SAMPLE_RATE).set_sample_width(2).raw_data
+
+
+def pcm_to_array(pcm: bytes) -> np.ndarray:
+    """Convert 16-bit PCM to float32 samples scaled to [-1.0, 1.0]."""
+    return np.frombuffer(pcm, dtype=np.int16).astype(np.float32) / 32768.0
+
+
+def audio_to_array(audio: AudioSegment) -> np.ndarray:
+    """
+    Convert a recording to the float32 waveform Whisper consumes.
+
+    Args:
+        audio: The recorded audio segment.
+
+    Returns:
+        Mono 16 kHz samples scaled to [-1.0, 1.0].
+    """
+    return pcm_to_array(audio_to_pcm(audio))
+
+
+def transcribe(model: WhisperModel, audio, high_accuracy: bool = False):
+    """
+    Transcribe English audio with the decoding settings for the chosen mode.
+
+    Args:
+        model: The Whisper model to run.
+        audio: Float32 waveform from audio_to_array, or a path to an audio file.
+        high_accuracy: Use beam search instead of greedy decoding.
+
+    Returns:
+        The (segments, info) pair from WhisperModel.transcribe.
+    """
+    options = ACCURATE_DECODE_OPTIONS if high_accuracy else FAST_DECODE_OPTIONS
+    # Fixing the language skips the detection pass over the first 30 seconds.
+    return model.transcribe(
+        audio,
+        language="en",
+        vad_filter=True,
+        vad_parameters=VAD_PARAMETERS,
+        **options,
+    )
+
+
+def transcribe_remote(
+    audio: AudioSegment,
+    high_accuracy: bool = False,
+    server_url: str = WHISPER_SERVER_URL,
+    timeout: float = WHISPER_SERVER_TIMEOUT,
+) -> str:
+    """
+    Transcribe a recording with a running server.py instance.
+
+    Args:
+        audio: The recorded audio segment.
+        high_accuracy: Use beam search instead of greedy decoding.
+        server_url: Base URL of the transcription server.
+        timeout: Seconds to wait for the server before raising.
+
+    Returns:
+        The transcript text.
+    """
+    request = urllib.request.Request(
+        f"{server_url.rstrip('/')}/transcribe?high_accuracy={str(high_accuracy).lower()}",
+        data=audio_to_pcm(audio),
+        headers={"Content-Type": "application/octet-stream"},
+        method="POST",
+    )
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return json.load(response)["text"]
+
+
+def trim_silence(audio: np.ndarray) -> np.ndarray:
+    """Cut leading and trailing silence, returning an empty array if there is no speech."""
+    speech = get_speech_timestamps(audio, VadOptions(**VAD_PARAMETERS))
+    if not speech:
+        return audio[:0]
+    return audio[speech[0]["start"]:speech[-1]["end"]]
+
+
+# faster-whisper's default thresholds for flagging a decode as silence or as
+# a hallucination, applied to batched results as well.
+NO_SPEECH_THRESHOLD = 0.6
+LOG_PROB_THRESHOLD = -1.0
+COMPRESSION_RATIO_THRESHOLD = 2.4
+
+
+def compression_ratio(text: str) -> float:
+    """Return how well text compresses; repetitive hallucinations compress very well."""
+    data = text.encode("utf-8")
+    return len(data) / len(zlib.compress(data))
+
+
+class TranscriptionBatcher:
+    """
+    Transcribes short clips from concurrent callers in shared CTranslate2 batches.
+
+    Every clip fits in a single 30-second Whisper window, so the clips in a
+    batch are padded to that window and encoded and decoded in one generate
+    call. On GPU a batch costs about as much as a single clip.
+
+    Only greedy decoding (FAST_DECODE_OPTIONS) is batched; high accuracy
+    requests go through transcribe(). Batched results get faster-whisper's
+    guards: a likely-silent clip returns an empty transcript, and a clip
+    whose text is over-repetitive or low-confidence resolves to None. The
+    caller then decodes it again through transcribe() with beam search and
+    temperature fallback on its own thread, so one noisy clip does not hold
+    up the rest of the queue.
+    """
+
+    def __init__(self, model: WhisperModel, max_batch_size: int = 8, max_wait: float = 0.05):
+        """
+        Start the background worker.
+
+        Args:
+            model: The Whisper model to run.
+            max_batch_size: Most clips decoded in one call.
+            max_wait: Seconds to wait for more clips after the first one arrives.
+        """
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.tokenizer = Tokenizer(
+            model.hf_tokenizer,
+            model.model.is_multilingual,
+            task="transcribe",
+            language="en",
+        )
+        self._queue: queue.Queue = queue.Queue()
+        threading.Thread(target=self._run, name="whisper-batcher", daemon=True).start()
+
+    def submit(self, audio: np.ndarray) -> Future:
+        """
+        Queue a clip for greedy transcription.
+
+        Args:
+            audio: Float32 waveform from audio_to_array, at most MAX_BATCH_CLIP_SAMPLES long.
+
+        Returns:
+            A future that resolves to the transcript text, or to None when
+            the clip needs decoding again with high accuracy.
+        """
+        if len(audio) > MAX_BATCH_CLIP_SAMPLES:
+            raise ValueError("Clips longer than 30 seconds must go through transcribe().")
+        future = Future()
+        self._queue.put((audio, future))
+        return future
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                try:
+                    batch.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+
+            jobs = [(audio, future) for audio, future in batch if future.set_running_or_notify_cancel()]
+            if not jobs:
+                continue
+            try:
+                texts = self._transcribe_batch([audio for audio, _ in jobs])
+            except Exception as e:
+                for _, future in jobs:
+                    future.set_exception(e)
+            else:
+                for (_, future), text in zip(jobs, texts):
+                    future.set_result(text)
+
+    def _transcribe_batch(self, clips: list[np.ndarray]) -> list[str | None]:
+        texts = [""] * len(clips)
+        speech = [(i, trim_silence(clip)) for i, clip in enumerate(clips)]
+        speech = [(i, clip) for i, clip in speech if len(clip) > 0]
+        if not speech:
+            return texts
+
+        features = np.stack([
+            pad_or_trim(self.model.feature_extractor(clip)) for _, clip in speech
+        ])
+        prompt = self.tokenizer.sot_sequence + [self.tokenizer.no_timestamps]
+        results = self.model.model.generate(
+            ctranslate2.StorageView.from_array(np.ascontiguousarray(features, dtype=np.float32)),
+            [prompt] * len(speech),
+            beam_size=FAST_DECODE_OPTIONS["beam_size"],
+            max_length=448,
+            return_scores=True,
+            return_no_speech_prob=True,
+        )
+        for (i, _), result in zip(speech, results):
+            text = self.tokenizer.decode(result.sequences_ids[0]).strip()
+            # With the default length_penalty of 1, the score is the mean token log-probability
+            avg_logprob = result.scores[0]
+            if result.no_speech_prob > NO_SPEECH_THRESHOLD and avg_logprob < LOG_PROB_THRESHOLD:
+                continue  # silence or noise, as faster-whisper would skip it
+            if (
+                avg_logprob < LOG_PROB_THRESHOLD
+                or (text and compression_ratio(text) > COMPRESSION_RATIO_THRESHOLD)
+            ):
+                texts[i] = None  # the caller falls back to transcribe()
+                continue
+            texts[i] = text
+        return texts
+
+
+def run_transcription(
+    audio: AudioSegment,
+    model: WhisperModel | None,
+    batcher: TranscriptionBatcher | None,
+    high_accuracy: bool = False,
+    partial: list[str] | None = None,
+) -> str:
+    """
+    Transcribe a recording by the fastest available route.
+
+    Uses the server when WHISPER_SERVER_URL is set, the batcher for greedy
+    decoding of clips that fit one Whisper window, and streaming
+    transcribe() otherwise, including for batched clips the batcher flags
+    as unreliable. Makes no Streamlit calls, so it can run on a
+    background thread.
+
+    Args:
+        audio: The recorded audio segment.
+        model: The local Whisper model; unused with a server.
+        batcher: The batcher for model; unused with a server.
+        high_accuracy: Use beam search instead of greedy decoding.
+        partial: Optional list that receives segment texts as they are decoded.
+
+    Returns:
+        The transcript text.
+    """
+    if partial is None:
+        partial = []
+    if WHISPER_SERVER_URL:
+        partial.append(transcribe_remote(audio, high_accuracy=high_accuracy))
+        return " ".join(partial)
+
+    samples = audio_to_array(audio)
+    if not high_accuracy and len(samples) <= MAX_BATCH_CLIP_SAMPLES:
+        # Short clips share one decoder batch with other sessions
+        text = batcher.submit(samples).result()
+        if text is not None:
+            partial.append(text)
+            return " ".join(partial)
+        high_accuracy = True  # the greedy decode looked unreliable
+    segments, info = transcribe(model, samples, high_accuracy=high_accuracy)
+    for seg in segments:
+        partial.append(seg.text)
+    return " ".join(partial)
@@ -0,0 +1,122 @@
+"""
+Streamlit Transcription Module
+
+This module holds the Streamlit side of transcription shared by the apps:
+cached Whisper resources, the sidebar settings, and background
+transcription jobs with live progress.
+"""
+
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+import streamlit as st
+from pydub import AudioSegment
+from transcriber import (
+    MODEL_CHOICES,
+    WHISPER_MODEL_SIZE,
+    WHISPER_SERVER_URL,
+    TranscriptionBatcher,
+    create_whisper_model,
+    run_transcription,
+)
+
+
+@st.cache_resource
+def load_whisper_model(model_size: str):
+    return create_whisper_model(model_size)
+
+@st.cache_resource
+def get_transcription_batcher(model_size: str):
+    return TranscriptionBatcher(load_whisper_model(model_size))
+
+@st.cache_resource(max_entries=64, ttl=3600, show_spinner=False)
+def start_transcription(audio_key: str, model_size: str, high_accuracy: bool, _audio, _executor):
+    # Keyed on the SHA-1 of the recording, so transcribing the same audio
+    # again reuses the finished (or still running) job instead of Whisper.
+    # Models are resolved here because the job runs off the script thread.
+    if WHISPER_SERVER_URL:
+        model = batcher = None
+    else:
+        model = load_whisper_model(model_size)
+        batcher = get_transcription_batcher(model_size)
+    partial = []
+    future = _executor.submit(run_transcription, _audio, model, batcher, high_accuracy, partial)
+    return future, partial
+
+
+def transcription_settings() -> tuple[str, bool]:
+    """
+    Render the model and decoding settings in the sidebar.
+
+    The chosen model is loaded right away so the first click doesn't pay for it.
+
+    Returns:
+        The selected model size and whether high accuracy mode is on.
+    """
+    with st.sidebar:
+        model_size = st.radio(
+            "Quality ↔ Speed",
+            MODEL_CHOICES,
+            index=MODEL_CHOICES.index(WHISPER_MODEL_SIZE),
+            help="distil-small.en has 4 decoder layers to small's 12, so it decodes fastest; medium is most accurate.",
+            disabled=bool(WHISPER_SERVER_URL),
+        )
+        high_accuracy = st.toggle(
+            "High accuracy mode",
+            help=(
+                "Use beam search with temperature fallback and context from earlier "
+                "segments instead of greedy decoding. Slower, but better for long "
+                "dictation. High accuracy clips are not batched with other sessions."
+            ),
+        )
+    if not WHISPER_SERVER_URL:
+        load_whisper_model(model_size)
+    return model_size, high_accuracy
+
+
+def init_transcription_state() -> None:
+    """Set up the session state used by transcription jobs."""
+    # Transcription runs on a per-session thread pool so the script thread
+    # stays free and the page keeps responding.
+    if "executor" not in st.session_state:
+        st.session_state.executor = ThreadPoolExecutor(max_workers=2)
+    if "transcription_job" not in st.session_state:
+        st.session_state.transcription_job = None
+    if "transcript" not in st.session_state:
+        st.session_state.transcript = ""
+
+
+def submit_transcription(audio: AudioSegment, model_size: str, high_accuracy: bool) -> None:
+    """Start transcribing a recording in the background."""
+    job_key = (hashlib.sha1(audio.raw_data).hexdigest(), model_size, high_accuracy)
+    future, partial = start_transcription(*job_key, audio, st.session_state.executor)
+    st.session_state.transcription_job = (future, partial, job_key)
+
+
+def transcription_running() -> bool:
+    """Return True while this session has a transcription job in flight."""
+    return st.session_state.transcription_job is not None
+
+
+@st.fragment(run_every=0.25)
+def show_transcription_progress() -> None:
+    """Show the segments decoded so far, and store the transcript once the job finishes."""
+    future, partial, job_key = st.session_state.transcription_job
+    if not future.done():
+        st.caption("Transcribing...")
+        st.markdown(" ".join(partial))
+        return
+    st.session_state.transcription_job = None
+    try:
+        st.session_state.transcript = future.result()
+    except Exception as e:
+        # Evict only the failed job so other sessions keep their finished ones
+        start_transcription.clear(*job_key, None, None)
+        st.session_state.transcript = ""  # don't leave the previous transcript in place
+        st.session_state.transcription_error = f"Error transcribing audio: {str(e)}"
+    st.rerun()
+
+
+def show_transcription_error() -> None:
+    """Show the error from the last failed transcription, once."""
+    if "transcription_error" in st.session_state:
+        st.error(st.session_state.pop("transcription_error"))